@@ -0,0 +1,87 @@
+from contextlib import asynccontextmanager
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from .database import engine
+
+
+# Arbitrary app-wide key for pg_advisory_lock (any bigint works, it just has to be shared by all workers)
+TRAINING_LOCK_KEY = 7_351_002
+
+# Serializes coroutines inside one worker so they don't each pin a pool connection while waiting
+_local_training_lock = asyncio.Lock()
+
+
+async def _take_advisory_lock() -> AsyncConnection | None:
+    """Returns the connection holding the advisory lock, or None if it could not be taken."""
+    conn = None
+    try:
+        conn = await engine.connect()
+        await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": TRAINING_LOCK_KEY})
+        return conn
+    except Exception as e:
+        print(f"Advisory lock unavailable, using local lock only: {e}")
+        if conn is not None:
+            await conn.invalidate()
+            await conn.close()
+        return None
+
+
+async def _release_advisory_lock(conn: AsyncConnection):
+    try:
+        await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": TRAINING_LOCK_KEY})
+    except Exception as e:
+        # A session-level lock would survive the connection going back to the pool,
+        # so drop the connection instead: the server releases the lock with the session
+        print(f"Error releasing advisory lock, dropping its connection: {e}")
+        await conn.invalidate()
+    finally:
+        await conn.close()
+
+
+@asynccontextmanager
+async def training_lock():
+    """
+    Cluster-wide lock around training: a PostgreSQL session-level advisory
+    lock held on a dedicated connection, so every uvicorn worker waits for the
+    same lock. If the advisory lock cannot be taken (e.g. no connection
+    available), training still runs under the process-local lock only.
+    """
+    async with _local_training_lock:
+        conn = await _take_advisory_lock()
+        try:
+            yield
+        finally:
+            if conn is not None:
+                await _release_advisory_lock(conn)
+
+
+async def ensure_registry_schema(conn: AsyncConnection):
+    """
+    Brings an existing model_versions table up to date (create_all only creates
+    missing tables, not new columns/indexes) and moves model_version_seq past
+    any version already stored.
+    """
+    await conn.execute(text(
+        "ALTER TABLE model_versions ADD COLUMN IF NOT EXISTS data_revision VARCHAR"
+    ))
+    await conn.execute(text(
+        "ALTER TABLE model_versions ADD COLUMN IF NOT EXISTS mlflow_run_id VARCHAR"
+    ))
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_model_versions_trained_at ON model_versions (trained_at)"
+    ))
+    await conn.execute(text("""
+        SELECT setval('model_version_seq', m, true)
+        FROM (
+            SELECT GREATEST(
+                COALESCE(MAX(CAST(substring(version FROM 2) AS INTEGER)), 0),
+                (SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM model_version_seq)
+            ) AS m
+            FROM model_versions
+            WHERE version ~ '^v[0-9]+$'
+        ) s
+        WHERE m > 0
+    """))
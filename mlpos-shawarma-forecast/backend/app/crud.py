@@ -1,6 +1,7 @@
-from typing import List
+from datetime import date
+from typing import AsyncIterator, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, delete
 
 from . import models, schemas
 
@@ -28,6 +29,30 @@ async def get_sales(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[m
     return result.scalars().all()
 
 
+EXPORT_COLUMNS = ["id", "date", "product_name", "size", "unit_price", "quantity"]
+
+
+async def stream_sales(
+    db: AsyncSession,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    chunk_size: int = 5000,
+) -> AsyncIterator[list]:
+    """
+    Yields sales as lists of plain row tuples (EXPORT_COLUMNS order), chunk_size rows at a time,
+    from a server-side cursor. No ORM objects, so memory stays flat however many rows match.
+    """
+    stmt = select(*(getattr(models.Sale, c) for c in EXPORT_COLUMNS)).order_by(models.Sale.date, models.Sale.id)
+    if start is not None:
+        stmt = stmt.where(models.Sale.date >= start)
+    if end is not None:
+        stmt = stmt.where(models.Sale.date <= end)
+
+    result = await db.stream(stmt.execution_options(yield_per=chunk_size))
+    async for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+
 async def get_sale(db: AsyncSession, sale_id: int) -> models.Sale | None:
     result = await db.execute(select(models.Sale).where(models.Sale.id == sale_id))
     return result.scalars().first()
@@ -55,4 +80,56 @@ async def delete_sale(db: AsyncSession, sale_id: int) -> bool:
         
     await db.delete(sale)
     await db.commit()
-    return True
\ No newline at end of file
+    return True
+
+
+# ====== SALES BATCH ======
+
+def _batch_conditions(batch: schemas.SaleBatchSelector) -> list:
+    conditions = []
+    if batch.ids is not None:
+        conditions.append(models.Sale.id.in_(batch.ids))
+
+    f = batch.filter
+    if f is not None:
+        if f.start is not None:
+            conditions.append(models.Sale.date >= f.start)
+        if f.end is not None:
+            conditions.append(models.Sale.date <= f.end)
+        if f.product_name is not None:
+            conditions.append(models.Sale.product_name == f.product_name)
+        if f.size is not None:
+            conditions.append(models.Sale.size == f.size)
+    return conditions
+
+
+async def update_sales(db: AsyncSession, batch: schemas.SaleBatchUpdate) -> int | None:
+    """Applies the same changes to every matching sale in one UPDATE. Returns None if nothing selects rows."""
+    conditions = _batch_conditions(batch)
+    update_data = batch.changes.dict(exclude_unset=True)
+    if not conditions or not update_data:
+        return None
+
+    result = await db.execute(
+        update(models.Sale)
+        .where(*conditions)
+        .values(**update_data)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def delete_sales(db: AsyncSession, batch: schemas.SaleBatchDelete) -> int | None:
+    """Deletes every matching sale in one DELETE. Returns None if nothing selects rows."""
+    conditions = _batch_conditions(batch)
+    if not conditions:
+        return None
+
+    result = await db.execute(
+        delete(models.Sale)
+        .where(*conditions)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
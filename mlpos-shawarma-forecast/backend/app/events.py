@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+from sqlalchemy import text
+
+from .database import engine
+
+
+# Postgres NOTIFY channel, so an event published by one uvicorn worker reaches
+# the SSE clients connected to every worker
+EVENTS_CHANNEL = "mlpos_events"
+
+MODEL_ACTIVATED = "model_activated"
+TRAINING_PROGRESS = "training_progress"
+FORECAST_UPDATED = "forecast_updated"
+
+# One bounded queue per connected SSE client (of this worker)
+_subscribers: set[asyncio.Queue] = set()
+
+_listener_conn = None
+_reconnect_task = None
+_stopping = False
+
+LISTENER_RETRY_SECONDS = 5
+
+
+def _fanout(message: dict):
+    for queue in list(_subscribers):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow client: drop the event rather than block training
+            pass
+
+
+def _on_notify(connection, pid, channel, payload):
+    _fanout(json.loads(payload))
+
+
+async def _connect_listener() -> bool:
+    global _listener_conn
+    conn = None
+    try:
+        conn = await engine.connect()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.add_listener(EVENTS_CHANNEL, _on_notify)
+        raw.driver_connection.add_termination_listener(_on_terminate)
+        _listener_conn = conn
+        return True
+    except Exception as e:
+        print(f"Event listener unavailable, events stay local to this worker: {e}")
+        if conn is not None:
+            await conn.invalidate()
+            await conn.close()
+        return False
+
+
+def _on_terminate(connection):
+    """asyncpg callback when the LISTEN connection dies (Postgres restart, idle timeout...)."""
+    global _listener_conn
+    dead, _listener_conn = _listener_conn, None  # publish() falls back to local fan-out meanwhile
+    print("Event listener connection lost, reconnecting")
+    _schedule_reconnect(dead)
+
+
+def _schedule_reconnect(dead=None):
+    global _reconnect_task
+    if _stopping or (_reconnect_task is not None and not _reconnect_task.done()):
+        return
+    _reconnect_task = asyncio.get_running_loop().create_task(_reconnect(dead))
+
+
+async def _reconnect(dead):
+    if dead is not None:
+        try:
+            await dead.invalidate()
+            await dead.close()
+        except Exception:
+            pass
+    while not _stopping and _listener_conn is None:
+        await asyncio.sleep(LISTENER_RETRY_SECONDS)
+        await _connect_listener()
+
+
+async def start_listener():
+    """LISTEN on the events channel. Without it, events only reach this worker's clients."""
+    if not await _connect_listener():
+        _schedule_reconnect()
+
+
+async def stop_listener():
+    global _listener_conn, _stopping
+    _stopping = True
+    if _reconnect_task is not None:
+        _reconnect_task.cancel()
+    if _listener_conn is not None:
+        await _listener_conn.close()
+        _listener_conn = None
+
+
+async def publish(event: str, data: dict):
+    """Sends an event to every SSE client. Never raises: events are best-effort."""
+    message = {"event": event, "data": data}
+    if _listener_conn is None:
+        _fanout(message)
+        return
+
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": EVENTS_CHANNEL, "payload": json.dumps(message, default=str)},
+            )
+    except Exception as e:
+        print(f"Error publishing event {event}: {e}")
+        _fanout(message)
+
+
+def subscribe() -> asyncio.Queue:
+    queue = asyncio.Queue(maxsize=100)
+    _subscribers.add(queue)
+    return queue
+
+
+def unsubscribe(queue: asyncio.Queue):
+    _subscribers.discard(queue)
+
+
+def format_sse(message: dict) -> str:
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'], default=str)}\n\n"
@@ -0,0 +1,74 @@
+import csv
+import io
+from typing import AsyncIterator
+
+from .crud import EXPORT_COLUMNS
+
+
+async def csv_chunks(partitions: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    """Header once, then one CSV block per partition."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+
+    async for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file the ParquetWriter writes into; drain() hands out what was written so far."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def parquet_chunks(partitions: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    """One Parquet row group per partition, streamed as soon as it is written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.date32()),
+        ("product_name", pa.string()),
+        ("size", pa.string()),
+        ("unit_price", pa.int64()),
+        ("quantity", pa.int64()),
+    ])
+
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for rows in partitions:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            yield sink.drain()
+    finally:
+        # Footer
+        writer.close()
+    yield sink.drain()
@@ -1,14 +1,20 @@
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException
-from typing import List
+from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from datetime import date
 import pandas as pd
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 
 from .database import Base, engine, get_db, AsyncSessionLocal
-from . import models, schemas, crud
+from . import models, schemas, crud, events
+from .coordination import ensure_registry_schema, training_lock
+from .export import csv_chunks, parquet_chunks
 from .ml.train import train_model
-from .ml.predict import predict_tomorrow_total_quantity
+from .ml.predict import predict_tomorrow_total_quantity, predict_range
+from .ml.backtest import backtest_current_data, load_backtest
+from .ml.retention import compact_registry, cleanup_deleted_versions, run_compactor
 
 app = FastAPI(title="Shawarma MLOps API")
 
@@ -33,6 +39,15 @@ async def on_startup():
     # Create tables on startup
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_registry_schema(conn)
+    await events.start_listener()
+    app.state.compactor = asyncio.create_task(run_compactor())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    app.state.compactor.cancel()
+    await events.stop_listener()
 
 
 # ====== SALES API ======
@@ -58,6 +73,64 @@ async def list_sales_endpoint(
     return sales
 
 
+@app.get("/sales/export")
+async def export_sales_endpoint(
+    format: str = "csv",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    if format == "csv":
+        to_chunks, media_type = csv_chunks, "text/csv"
+    elif format == "parquet":
+        to_chunks, media_type = parquet_chunks, "application/vnd.apache.parquet"
+    else:
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'parquet'")
+
+    async def stream():
+        # Own session: it has to stay open for as long as the response is streaming
+        async with AsyncSessionLocal() as db:
+            async for chunk in to_chunks(crud.stream_sales(db, start=start, end=end)):
+                yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="sales.{format}"'},
+    )
+
+
+# Batch routes must be declared before /sales/{sale_id}, otherwise "batch" is parsed as a sale_id
+
+@app.patch("/sales/batch")
+async def update_sales_batch_endpoint(
+    batch: schemas.SaleBatchUpdate,
+    db: AsyncSession = Depends(get_db),
+):
+    updated = await crud.update_sales(db, batch)
+    if updated is None:
+        raise HTTPException(status_code=400, detail="Provide ids or a filter, and at least one field to change")
+
+    # One retrain for the whole batch
+    if updated:
+        await train_model(db)
+    return {"message": f"Updated {updated} sales", "updated": updated}
+
+
+@app.delete("/sales/batch")
+async def delete_sales_batch_endpoint(
+    batch: schemas.SaleBatchDelete,
+    db: AsyncSession = Depends(get_db),
+):
+    deleted = await crud.delete_sales(db, batch)
+    if deleted is None:
+        raise HTTPException(status_code=400, detail="Provide ids or a filter")
+
+    # One retrain for the whole batch
+    if deleted:
+        await train_model(db)
+    return {"message": f"Deleted {deleted} sales", "deleted": deleted}
+
+
 @app.put("/sales/{sale_id}", response_model=schemas.SaleRead)
 async def update_sale_endpoint(
     sale_id: int,
@@ -126,6 +199,8 @@ async def import_sales_csv(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing row {inserted + 1}: {e}")
 
+    await events.publish(events.TRAINING_PROGRESS, {"stage": "imported", "inserted": inserted})
+
     # Synchronous Training
     await train_model(db)
 
@@ -146,19 +221,76 @@ async def forecast_tomorrow_endpoint(
     return result
 
 
+@app.get("/forecast/range")
+async def forecast_range_endpoint(
+    start: date,
+    end: date,
+    db: AsyncSession = Depends(get_db),
+):
+    result = await predict_range(db, start, end)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+# ====== EVENTS (SSE) ======
+
+@app.get("/events")
+async def events_endpoint(request: Request):
+    """
+    Server-sent events: model_activated, training_progress, forecast_updated.
+    The current forecast is sent on connect, so clients never need to poll /forecast/tomorrow.
+    """
+    queue = events.subscribe()
+
+    async def stream():
+        try:
+            async with AsyncSessionLocal() as db:
+                snapshot = await predict_tomorrow_total_quantity(db)
+            yield events.format_sse({"event": events.FORECAST_UPDATED, "data": snapshot})
+
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Keep-alive comment so proxies don't close an idle stream
+                    yield ": ping\n\n"
+                    continue
+                yield events.format_sse(message)
+        finally:
+            events.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ====== MODEL REGISTRY ======
 
 @app.get("/models", response_model=List[schemas.ModelVersionRead])
-async def list_models(db: AsyncSession = Depends(get_db)):
+async def list_models(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
     from sqlalchemy import select
-    result = await db.execute(select(models.ModelVersion).order_by(models.ModelVersion.trained_at.desc()))
+    result = await db.execute(
+        select(models.ModelVersion).order_by(models.ModelVersion.trained_at.desc()).offset(skip).limit(limit)
+    )
     return result.scalars().all()
 
 
+@app.post("/models/compact")
+async def compact_models_endpoint(db: AsyncSession = Depends(get_db)):
+    # Same as the background compactor, on demand
+    return await compact_registry(db)
+
+
 @app.delete("/models/{version}")
 async def delete_model(version: str, db: AsyncSession = Depends(get_db)):
     from sqlalchemy import select
-    import os
     
     # Check if active
     result = await db.execute(select(models.ModelVersion).where(models.ModelVersion.version == version))
@@ -170,13 +302,39 @@ async def delete_model(version: str, db: AsyncSession = Depends(get_db)):
     if model_v.is_active:
         raise HTTPException(status_code=400, detail="Cannot delete active model")
         
-    # Delete file
-    try:
-        if os.path.exists(model_v.path):
-            os.remove(model_v.path)
-    except Exception as e:
-        print(f"Error deleting file: {e}")
-        
-    await db.delete(model_v)
-    await db.commit()
-    return {"message": f"Model {version} deleted"}
\ No newline at end of file
+    async with training_lock():
+        await db.delete(model_v)
+        await db.commit()
+
+        # Delete its file, backtest report and MLflow copy, unless another version shares them
+        await cleanup_deleted_versions(db, [model_v])
+    return {"message": f"Model {version} deleted"}
+
+
+@app.post("/backtest")
+async def backtest_endpoint(
+    n_origins: int = Query(8, ge=1, le=52),
+    horizon: int = Query(7, ge=1),
+    step: int = Query(7, ge=1),
+    db: AsyncSession = Depends(get_db),
+):
+    # Evaluates the current data revision; GET /models/{version}/backtest then returns it for every version trained on it
+    report = await backtest_current_data(db, n_origins=n_origins, horizon=horizon, step=step)
+    if "error" in report:
+        raise HTTPException(status_code=400, detail=report["error"])
+    return report
+
+
+@app.get("/models/{version}/backtest")
+async def get_backtest_endpoint(version: str, db: AsyncSession = Depends(get_db)):
+    from sqlalchemy import select
+
+    result = await db.execute(select(models.ModelVersion).where(models.ModelVersion.version == version))
+    model_v = result.scalars().first()
+    if not model_v:
+        raise HTTPException(status_code=404, detail="Model version not found")
+
+    report = load_backtest(model_v)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No backtest found for the data this model version was trained on")
+    return report
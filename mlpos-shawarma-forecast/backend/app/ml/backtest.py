@@ -0,0 +1,233 @@
+from pathlib import Path
+from datetime import datetime
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sklearn.base import clone
+import joblib
+
+from .. import models
+from .train import MODELS_DIR, FEATURE_COLUMNS, build_daily_frame, build_pipeline, dataset_revision
+
+
+# Folds fitted in parallel per backtest. Kept small: this runs inside a uvicorn worker
+BACKTEST_N_JOBS = 2
+
+# One backtest at a time per worker (the one after training, or POST /backtest)
+_backtest_lock = asyncio.Lock()
+
+# Strong references to background backtests, so they aren't garbage collected mid-run
+_background_tasks = set()
+
+
+def backtest_path_for(revision: str) -> Path:
+    """
+    Reports are keyed by data revision: every version is built by the same
+    build_pipeline(), so the report only depends on the data it is run on.
+    A version's report is the one for the revision it was trained on.
+    """
+    return MODELS_DIR / f"backtest_{revision}.json"
+
+
+def build_fold_masks(dates: np.ndarray, origins: np.ndarray, horizon: int):
+    """
+    Builds train/test masks for every fold in one broadcasted pass.
+
+    Returns (train_mask, test_mask, offset), each shaped (n_folds, n_rows).
+    offset is the number of days between a row and the fold origin,
+    so offset + 1 is the forecast horizon of a test row.
+    """
+    offset = (dates[None, :] - origins[:, None]).astype("timedelta64[D]").astype(int)
+    train_mask = offset < 0
+    test_mask = (offset >= 0) & (offset < horizon)
+    return train_mask, test_mask, offset
+
+
+def _fit_predict_fold(pipeline, X: pd.DataFrame, y: pd.Series, train_idx: np.ndarray, test_idx: np.ndarray) -> np.ndarray:
+    pipeline.fit(X.iloc[train_idx], y.iloc[train_idx])
+    return pipeline.predict(X.iloc[test_idx])
+
+
+def summarize(results: pd.DataFrame, keys: list) -> pd.DataFrame:
+    """MAE / MAPE (%) / bias (predicted - actual) per group of backtest rows."""
+    error = results["predicted"] - results["actual"]
+    actual = results["actual"].where(results["actual"] != 0)
+    scored = results.assign(
+        error=error,
+        abs_error=error.abs(),
+        ape=error.abs() / actual * 100,
+    )
+    summary = scored.groupby(keys, as_index=False).agg(
+        mae=("abs_error", "mean"),
+        mape=("ape", "mean"),
+        bias=("error", "mean"),
+        n=("error", "size"),
+    )
+    # NaN (e.g. MAPE when every actual is zero) is not valid JSON
+    return summary.astype(object).where(summary.notna(), None)
+
+
+def run_backtest(
+    df_daily: pd.DataFrame,
+    pipeline,
+    n_origins: int = 8,
+    horizon: int = 7,
+    step: int = 7,
+    n_jobs: int = BACKTEST_N_JOBS,
+) -> dict:
+    """
+    Rolling-origin backtest: for each origin, refit a clone of `pipeline` on all
+    days before it and forecast the next `horizon` days. Folds run in parallel.
+    """
+    if horizon < 1 or step < 1 or n_origins < 1:
+        return {"error": "n_origins, horizon and step must be at least 1"}
+
+    dates = df_daily["date"].values.astype("datetime64[D]")
+    last_origin = dates.max() - np.timedelta64(horizon - 1, "D")
+    origins = last_origin - np.arange(n_origins)[::-1] * np.timedelta64(step, "D")
+
+    train_mask, test_mask, offset = build_fold_masks(dates, origins, horizon)
+
+    # Every fold needs history to train on and sales to score (gaps in the data leave folds empty)
+    usable = train_mask.any(axis=1) & test_mask.any(axis=1)
+    origins = origins[usable]
+    train_mask, test_mask, offset = train_mask[usable], test_mask[usable], offset[usable]
+    if len(origins) == 0:
+        return {"error": "Not enough history to backtest. Upload more sales data."}
+
+    X = df_daily[FEATURE_COLUMNS]
+    y = df_daily["total_quantity"]
+
+    fold_predictions = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_fit_predict_fold)(
+            clone(pipeline), X, y, np.flatnonzero(train_mask[i]), np.flatnonzero(test_mask[i])
+        )
+        for i in range(len(origins))
+    )
+
+    folds = []
+    for i, y_pred in enumerate(fold_predictions):
+        test_idx = np.flatnonzero(test_mask[i])
+        folds.append(pd.DataFrame({
+            "origin": str(origins[i]),
+            "horizon": offset[i, test_idx] + 1,
+            "product_name": df_daily["product_name"].values[test_idx],
+            "size": df_daily["size"].values[test_idx],
+            "actual": y.values[test_idx],
+            "predicted": y_pred,
+        }))
+    results = pd.concat(folds, ignore_index=True)
+
+    per_sku = summarize(results, ["product_name", "size", "horizon"])
+    overall = summarize(results, ["horizon"])
+
+    return {
+        "origins": [str(o) for o in origins],
+        "horizon": horizon,
+        "step": step,
+        "per_sku": per_sku.to_dict(orient="records"),
+        "overall": overall.to_dict(orient="records"),
+    }
+
+
+async def backtest_revision(
+    df_daily: pd.DataFrame,
+    revision: str,
+    versions: list,
+    n_origins: int = 8,
+    horizon: int = 7,
+    step: int = 7,
+) -> dict:
+    """
+    Backtests the model pipeline on one data revision. The report is stored only
+    when some version was trained on that revision (otherwise nothing would ever
+    clean it up); a stored report with the same settings is reused.
+    """
+    report_path = backtest_path_for(revision)
+    async with _backtest_lock:
+        if report_path.exists():
+            stored = json.loads(report_path.read_text())
+            if (stored.get("horizon"), stored.get("step"), stored.get("n_origins")) == (horizon, step, n_origins):
+                return stored
+
+        # CPU-bound, keep it off the event loop
+        report = await asyncio.to_thread(
+            run_backtest, df_daily, build_pipeline(), n_origins, horizon, step
+        )
+        if "error" in report:
+            return report
+
+        report["n_origins"] = n_origins
+        report["data_revision"] = revision
+        report["versions"] = versions
+        report["evaluated_at"] = datetime.utcnow().isoformat() + "Z"
+
+        if versions:
+            report_path.write_text(json.dumps(report, indent=2))
+        return report
+
+
+async def backtest_current_data(
+    db: AsyncSession,
+    n_origins: int = 8,
+    horizon: int = 7,
+    step: int = 7,
+) -> dict:
+    """Backtests the current sales data (stored under its data revision if a version was trained on it)."""
+    result = await db.execute(select(models.Sale))
+    rows = result.scalars().all()
+    if not rows:
+        return {"error": "No sales data found, cannot backtest model."}
+
+    df_daily = build_daily_frame(rows)
+    revision = dataset_revision(df_daily)
+
+    result = await db.execute(
+        select(models.ModelVersion.version).where(models.ModelVersion.data_revision == revision)
+    )
+    versions = list(result.scalars().all())
+    return await backtest_revision(df_daily, revision, versions, n_origins, horizon, step)
+
+
+def schedule_backtest(df_daily: pd.DataFrame, revision: str, version: str):
+    """Backtests a freshly activated version in the background, so every version gets a report without manual work."""
+    async def run():
+        try:
+            report = await backtest_revision(df_daily, revision, [version])
+            if "error" in report:
+                print(f"Backtest of {version} skipped: {report['error']}")
+        except Exception as e:
+            print(f"Backtest of {version} failed: {e}")
+
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def load_backtest(model_version: models.ModelVersion) -> dict | None:
+    """Returns the stored backtest report for the data a model version was trained on, if any."""
+    if not model_version.data_revision:
+        return None
+    report_path = backtest_path_for(model_version.data_revision)
+    if not report_path.exists():
+        return None
+    return json.loads(report_path.read_text())
+
+
+async def remove_unreferenced_backtests(db: AsyncSession, revisions: set):
+    """Deletes the reports of data revisions no registered version was trained on anymore."""
+    revisions = {r for r in revisions if r}
+    if not revisions:
+        return
+
+    result = await db.execute(
+        select(models.ModelVersion.data_revision)
+        .where(models.ModelVersion.data_revision.in_(revisions))
+        .distinct()
+    )
+    for revision in revisions - set(result.scalars().all()):
+        backtest_path_for(revision).unlink(missing_ok=True)
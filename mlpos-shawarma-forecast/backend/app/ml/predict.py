@@ -1,11 +1,13 @@
-from datetime import date
+from datetime import date, timedelta
 from pathlib import Path
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import joblib
+import numpy as np
 import pandas as pd
 from .. import models
+from .train import FEATURE_COLUMNS, add_date_features
 
 # Define the combinations we want to predict for
 PRODUCTS = ["Chicken Shawarma", "Meat Shawarma", "Mixed Shawarma"]
@@ -18,6 +20,11 @@ PRICES = {
     "Mixed Shawarma": {"Small": 8, "Medium": 12, "Large": 14},
 }
 
+# Prediction interval reported next to every point forecast
+QUANTILES = [10, 50, 90]
+
+MAX_RANGE_DAYS = 366
+
 async def get_active_model_info(db: AsyncSession):
     """Returns the active model version from DB."""
     result = await db.execute(
@@ -27,67 +34,124 @@ async def get_active_model_info(db: AsyncSession):
     return model_version
 
 
-async def predict_tomorrow_total_quantity(db: AsyncSession) -> dict:
-    """Predicts sales for TOMORROW for ALL product/size combinations."""
-    # 1) Get active model
+def forecast_frame(dates: list) -> pd.DataFrame:
+    """One row per date x valid product/size combination (price > 0), with model features."""
+    combos = [
+        (product, size)
+        for product in PRODUCTS
+        for size in SIZES
+        if PRICES[product].get(size, 0) > 0
+    ]
+    df = pd.DataFrame(
+        [(d, product, size) for d in dates for product, size in combos],
+        columns=["date", "product_name", "size"],
+    )
+    df["date"] = pd.to_datetime(df["date"])
+    return add_date_features(df)
+
+
+def tree_predictions(model, X: pd.DataFrame) -> np.ndarray:
+    """
+    Per-tree predictions of the forest, shape (n_trees, n_rows).
+    The preprocessor runs once; every tree then predicts all rows in one call.
+    Their mean is exactly model.predict(X).
+    """
+    X_t = model.named_steps["preprocessor"].transform(X[FEATURE_COLUMNS])
+    forest = model.named_steps["regressor"]
+    return np.stack([tree.predict(X_t) for tree in forest.estimators_])
+
+
+def _interval(samples: np.ndarray) -> dict:
+    p10, p50, p90 = np.percentile(samples, QUANTILES, axis=0)
+    return {"p10": int(round(p10)), "p50": int(round(p50)), "p90": int(round(p90))}
+
+
+def forecast_dates(model, dates: list) -> list:
+    """Point forecast + P10/P50/P90 per product/size for each date, from a single pass over the trees."""
+    df = forecast_frame(dates)
+    per_tree = tree_predictions(model, df)
+    point = per_tree.mean(axis=0)
+    quantiles = np.percentile(np.maximum(per_tree, 0), QUANTILES, axis=0)
+
+    row_dates = df["date"].dt.date.values
+    days = []
+    for d in dates:
+        idx = np.flatnonzero(row_dates == d)
+
+        predictions = []
+        kept = []
+        for i in idx:
+            qty = int(round(max(0, point[i])))  # Ensure non-negative
+            if qty > 0:
+                kept.append(i)
+                predictions.append({
+                    "product_name": df["product_name"].iat[i],
+                    "size": df["size"].iat[i],
+                    "predicted_quantity": qty,
+                    "p10": int(round(quantiles[0, i])),
+                    "p50": int(round(quantiles[1, i])),
+                    "p90": int(round(quantiles[2, i])),
+                })
+
+        # Sort by quantity desc
+        predictions.sort(key=lambda x: x["predicted_quantity"], reverse=True)
+
+        days.append({
+            "date": d.isoformat(),
+            "total_predicted_quantity": sum(p["predicted_quantity"] for p in predictions),
+            # Quantiles of the per-tree day totals over the same items as the breakdown
+            # (not the sum of per-item quantiles)
+            "total_interval": _interval(np.maximum(per_tree[:, kept], 0).sum(axis=1)),
+            "breakdown": predictions,
+        })
+    return days
+
+
+async def load_active_model(db: AsyncSession):
+    """Returns (model_version, model) or (None, error message)."""
     model_version = await get_active_model_info(db)
     if not model_version:
-        return {"error": "No active model found. Please train the model first."}
+        return None, "No active model found. Please train the model first."
 
     model_path = Path(model_version.path)
     if not model_path.exists():
-        return {"error": f"Model file not found: {model_path}"}
+        return None, f"Model file not found: {model_path}"
+
+    return model_version, joblib.load(model_path)
 
-    # 2) Load model
-    model = joblib.load(model_path)
 
-    # 3) Prepare features for TOMORROW
-    from datetime import timedelta
+async def predict_tomorrow_total_quantity(db: AsyncSession) -> dict:
+    """Predicts sales for TOMORROW for ALL product/size combinations."""
+    model_version, model = await load_active_model(db)
+    if not model_version:
+        return {"error": model}
+
     tomorrow = date.today() + timedelta(days=1)
-    year = tomorrow.year
-    month = tomorrow.month
-    day = tomorrow.day
-    day_of_week = tomorrow.weekday()
-
-    predictions = []
-    total_predicted_quantity = 0
-
-    # 4) Iterate over all valid combinations
-    for product in PRODUCTS:
-        for size in SIZES:
-            # Check if this combination is valid (price > 0)
-            if PRICES[product].get(size, 0) == 0:
-                continue
-
-            # Create input DataFrame for this single item
-            X_item = pd.DataFrame([{
-                "year": year,
-                "month": month,
-                "day": day,
-                "day_of_week": day_of_week,
-                "product_name": product,
-                "size": size
-            }])
-
-            # Predict
-            y_pred = model.predict(X_item)[0]
-            qty = int(round(max(0, y_pred))) # Ensure non-negative
+    forecast = forecast_dates(model, [tomorrow])[0]
 
-            if qty > 0:
-                predictions.append({
-                    "product_name": product,
-                    "size": size,
-                    "predicted_quantity": qty
-                })
-                total_predicted_quantity += qty
+    return {
+        **forecast,
+        "model_version": model_version.version,
+        "mae": model_version.mae,
+    }
 
-    # Sort by quantity desc
-    predictions.sort(key=lambda x: x["predicted_quantity"], reverse=True)
 
+async def predict_range(db: AsyncSession, start: date, end: date) -> dict:
+    """Same as predict_tomorrow_total_quantity, for every day in [start, end]."""
+    if end < start:
+        return {"error": "end must not be before start"}
+    if (end - start).days >= MAX_RANGE_DAYS:
+        return {"error": f"Range too long, at most {MAX_RANGE_DAYS} days"}
+
+    model_version, model = await load_active_model(db)
+    if not model_version:
+        return {"error": model}
+
+    dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
     return {
-        "date": tomorrow.isoformat(),
-        "total_predicted_quantity": total_predicted_quantity,
-        "breakdown": predictions,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": forecast_dates(model, dates),
         "model_version": model_version.version,
         "mae": model_version.mae,
-    }
\ No newline at end of file
+    }
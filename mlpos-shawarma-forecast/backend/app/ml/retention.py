@@ -0,0 +1,161 @@
+from pathlib import Path
+from datetime import datetime, timedelta
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from mlflow.entities import ViewType
+from mlflow.tracking import MlflowClient
+from mlflow.store.artifact.artifact_repository_registry import get_artifact_repository
+
+from .. import models
+from ..coordination import training_lock
+from ..database import AsyncSessionLocal
+from .backtest import remove_unreferenced_backtests
+from .train import MLFLOW_EXPERIMENT
+
+
+# Retention policy. A version is kept if it is active, one of the KEEP_LAST newest,
+# or one of the KEEP_BEST lowest-MAE versions younger than MAX_AGE_DAYS.
+# Everything else is pruned. Training applies it after every new version, so right
+# after a run the registry holds at most KEEP_LAST + KEEP_BEST + 1 versions; it can
+# exceed that between runs only if a compaction failed (the hourly loop catches up).
+KEEP_LAST = 10
+KEEP_BEST = 3
+MAX_AGE_DAYS = 90
+
+# Backstop only: training already compacts
+COMPACT_INTERVAL_SECONDS = 60 * 60
+
+
+async def remove_unreferenced_artifacts(db: AsyncSession, paths: set) -> list:
+    """
+    Deletes the model files in `paths` that no registry row points to anymore
+    (artifacts are content-addressed, so several versions can share one file).
+    """
+    if not paths:
+        return []
+
+    result = await db.execute(
+        select(models.ModelVersion.path).where(models.ModelVersion.path.in_(paths)).distinct()
+    )
+    still_used = set(result.scalars().all())
+
+    removed = []
+    for path in paths - still_used:
+        try:
+            Path(path).unlink(missing_ok=True)
+            removed.append(path)
+        except Exception as e:
+            print(f"Error deleting file: {e}")
+    return removed
+
+
+def _purge_mlflow_model_copies(client: MlflowClient, digest: str):
+    """
+    Deletes the MLflow model copies of one content-addressed artifact. With
+    deduplication only the first run of a digest holds the copy, so this is
+    only called once no version references the digest anymore, and covers
+    runs already marked deleted by earlier compactions.
+    """
+    experiment = client.get_experiment_by_name(MLFLOW_EXPERIMENT)
+    if experiment is None:
+        return
+    runs = client.search_runs(
+        [experiment.experiment_id],
+        filter_string=f"params.artifact_sha256 = '{digest}'",
+        run_view_type=ViewType.ALL,
+    )
+    for run in runs:
+        get_artifact_repository(run.info.artifact_uri).delete_artifacts()
+
+
+def _cleanup_mlflow(run_ids: list, removed_paths: list):
+    """Marks the runs of deleted versions deleted, and purges model copies of artifacts that are gone."""
+    try:
+        client = MlflowClient()
+        for run_id in run_ids:
+            if run_id:
+                client.delete_run(run_id)
+        for path in removed_paths:
+            _purge_mlflow_model_copies(client, Path(path).stem)
+    except Exception as e:
+        print(f"Error cleaning up MLflow runs: {e}")
+
+
+async def cleanup_deleted_versions(db: AsyncSession, rows: list) -> list:
+    """
+    Cleans up after registry rows were deleted: artifacts, backtest reports and
+    MLflow model copies no remaining version references. Returns the removed files.
+    """
+    removed = await remove_unreferenced_artifacts(db, {row.path for row in rows})
+    await remove_unreferenced_backtests(db, {row.data_revision for row in rows})
+    await asyncio.to_thread(_cleanup_mlflow, [row.mlflow_run_id for row in rows], removed)
+    return removed
+
+
+async def compact_registry_locked(
+    db: AsyncSession,
+    keep_last: int = KEEP_LAST,
+    keep_best: int = KEEP_BEST,
+    max_age_days: int = MAX_AGE_DAYS,
+) -> dict:
+    """
+    Applies the retention policy. The caller must hold training_lock, so a new
+    version can't start sharing an artifact we are about to delete.
+    """
+    newest = select(models.ModelVersion.id).order_by(models.ModelVersion.trained_at.desc()).limit(keep_last)
+    best = (
+        select(models.ModelVersion.id)
+        .where(models.ModelVersion.trained_at >= datetime.utcnow() - timedelta(days=max_age_days))
+        # Unmeasured runs (mae is None) must not count as "best"
+        .where(models.ModelVersion.mae.isnot(None))
+        .order_by(models.ModelVersion.mae.asc())
+        .limit(keep_best)
+    )
+    keep_ids = set((await db.execute(newest)).scalars().all())
+    keep_ids |= set((await db.execute(best)).scalars().all())
+
+    result = await db.execute(
+        select(
+            models.ModelVersion.id,
+            models.ModelVersion.version,
+            models.ModelVersion.path,
+            models.ModelVersion.data_revision,
+            models.ModelVersion.mlflow_run_id,
+        )
+        .where(models.ModelVersion.is_active == False)
+        .where(models.ModelVersion.id.not_in(keep_ids))
+    )
+    pruned = result.all()
+    if not pruned:
+        return {"pruned": [], "removed_files": []}
+
+    await db.execute(
+        delete(models.ModelVersion)
+        .where(models.ModelVersion.id.in_([row.id for row in pruned]))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+    removed = await cleanup_deleted_versions(db, pruned)
+    return {"pruned": [row.version for row in pruned], "removed_files": removed}
+
+
+async def compact_registry(db: AsyncSession, **policy) -> dict:
+    """Applies the retention policy: prunes registry rows, their MLflow runs, backtest reports and unreferenced artifacts."""
+    async with training_lock():
+        return await compact_registry_locked(db, **policy)
+
+
+async def run_compactor():
+    """Background loop: applies the retention policy every COMPACT_INTERVAL_SECONDS."""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await compact_registry(db)
+            if result["pruned"]:
+                print(f"Registry compaction pruned {len(result['pruned'])} versions")
+        except Exception as e:
+            print(f"Registry compaction failed: {e}")
+        await asyncio.sleep(COMPACT_INTERVAL_SECONDS)
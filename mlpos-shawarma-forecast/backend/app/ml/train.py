@@ -1,11 +1,14 @@
 from pathlib import Path
 from datetime import datetime
 import asyncio
+import hashlib
+import io
+import os
 import random
 
 import pandas as pd
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
@@ -17,21 +20,23 @@ import mlflow
 import mlflow.sklearn
 
 from .. import models
+from .. import events
+from ..coordination import training_lock
 
 
 MODELS_DIR = Path(__file__).resolve().parent / "models"
 MODELS_DIR.mkdir(exist_ok=True)
 
+MLFLOW_EXPERIMENT = "Shawarma_Sales_Forecast"
 
-async def train_model(db: AsyncSession) -> dict:
-    # 1) Fetch all sales from DB
-    result = await db.execute(select(models.Sale))
-    rows = result.scalars().all()
 
-    if not rows:
-        return {"error": "No sales data found, cannot train model."}
-    
-    # 2) Convert to DataFrame
+CATEGORICAL_FEATURES = ["product_name", "size"]
+NUMERICAL_FEATURES = ["year", "month", "day", "day_of_week"]
+FEATURE_COLUMNS = NUMERICAL_FEATURES + CATEGORICAL_FEATURES
+
+
+def build_daily_frame(rows) -> pd.DataFrame:
+    """Aggregates Sale rows into one total_quantity per date/product/size."""
     data = [
         {
             "date": r.date,
@@ -43,40 +48,121 @@ async def train_model(db: AsyncSession) -> dict:
     ]
     df = pd.DataFrame(data)
 
-    # 3) Group by Date + Product + Size
     df_daily = df.groupby(["date", "product_name", "size"], as_index=False)["quantity"].sum()
     df_daily = df_daily.rename(columns={"quantity": "total_quantity"})
-    
+
     # Convert date to datetime
     df_daily["date"] = pd.to_datetime(df_daily["date"])
+    return add_date_features(df_daily)
 
-    # Feature Engineering
-    df_daily["year"] = df_daily["date"].dt.year
-    df_daily["month"] = df_daily["date"].dt.month
-    df_daily["day"] = df_daily["date"].dt.day
-    df_daily["day_of_week"] = df_daily["date"].dt.weekday
-    
-    # Features: year, month, day, day_of_week, product_name, size
-    X = df_daily[["year", "month", "day", "day_of_week", "product_name", "size"]]
-    y = df_daily["total_quantity"]
 
-    # 4) Create Pipeline with OneHotEncoder for categorical features
-    categorical_features = ["product_name", "size"]
-    numerical_features = ["year", "month", "day", "day_of_week"]
+def add_date_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds the calendar features the model is trained on (vectorized over the 'date' column)."""
+    df["year"] = df["date"].dt.year
+    df["month"] = df["date"].dt.month
+    df["day"] = df["date"].dt.day
+    df["day_of_week"] = df["date"].dt.weekday
+    return df
 
+
+def build_pipeline() -> Pipeline:
+    """OneHotEncoder for categorical features + RandomForest on top."""
     preprocessor = ColumnTransformer(
         transformers=[
-            ("num", "passthrough", numerical_features),
-            ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_features),
+            ("num", "passthrough", NUMERICAL_FEATURES),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_FEATURES),
         ]
     )
 
-    model_pipeline = Pipeline(steps=[
+    return Pipeline(steps=[
         ("preprocessor", preprocessor),
         ("regressor", RandomForestRegressor(n_estimators=100, random_state=42))
     ])
 
-    # 5) Train/Test Split
+
+def store_artifact(model) -> tuple:
+    """
+    Content-addressed save: the file is named after the sha256 of the pickle,
+    so identical models are stored once. Returns (path, digest, is_new).
+    """
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    data = buffer.getvalue()
+
+    digest = hashlib.sha256(data).hexdigest()
+    path = MODELS_DIR / f"{digest}.pkl"
+    if path.exists():
+        return path, digest, False
+
+    # Write + rename, so a reader never sees a half-written file
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+    return path, digest, True
+
+
+def dataset_revision(df_daily: pd.DataFrame) -> str:
+    """Content hash of the daily aggregate. Same data -> same revision, no matter which worker computes it."""
+    hashed = pd.util.hash_pandas_object(
+        df_daily[["date", "product_name", "size", "total_quantity"]], index=False
+    )
+    return hashlib.sha1(hashed.values.tobytes()).hexdigest()
+
+
+async def _publish_forecast(db: AsyncSession):
+    """Best-effort: the model is already live, a failing forecast must not fail the request."""
+    from .predict import predict_tomorrow_total_quantity
+    try:
+        forecast = await predict_tomorrow_total_quantity(db)
+    except Exception as e:
+        print(f"Error building forecast event: {e}")
+        return
+    await events.publish(events.FORECAST_UPDATED, forecast)
+
+
+async def train_model(db: AsyncSession) -> dict:
+    # Only one worker trains at a time; the others wait and then usually find
+    # the dataset revision already trained, so they skip the duplicate fit.
+    async with training_lock():
+        return await _train_model_locked(db)
+
+
+async def _train_model_locked(db: AsyncSession) -> dict:
+    # 1) Fetch all sales from DB
+    result = await db.execute(select(models.Sale))
+    rows = result.scalars().all()
+
+    if not rows:
+        return {"error": "No sales data found, cannot train model."}
+    
+    # 2) Group by Date + Product + Size, add calendar features
+    df_daily = build_daily_frame(rows)
+
+    # Skip if the active model was already trained on exactly this data
+    revision = dataset_revision(df_daily)
+    result_active = await db.execute(
+        select(models.ModelVersion).where(models.ModelVersion.is_active == True)
+    )
+    active = result_active.scalars().first()
+    if active and active.data_revision == revision:
+        skipped = {
+            "version": active.version,
+            "mae": active.mae,
+            "path": active.path,
+            "trained_at": active.trained_at.isoformat() + "Z",
+            "skipped": True,
+        }
+        await events.publish(events.TRAINING_PROGRESS, {"stage": "skipped", "version": active.version})
+        return skipped
+
+    # Features: year, month, day, day_of_week, product_name, size
+    X = df_daily[FEATURE_COLUMNS]
+    y = df_daily["total_quantity"]
+
+    # 3) Create Pipeline with OneHotEncoder for categorical features
+    model_pipeline = build_pipeline()
+
+    # 4) Train/Test Split
     if len(df_daily) >= 10:
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42
@@ -86,67 +172,84 @@ async def train_model(db: AsyncSession) -> dict:
         X_test, y_test = X, y
         
     # Train
-    model_pipeline.fit(X_train, y_train)
+    await events.publish(events.TRAINING_PROGRESS, {"stage": "fitting", "rows": len(df_daily)})
+    # Off the event loop, so SSE clients of this worker get progress while it fits
+    await asyncio.to_thread(model_pipeline.fit, X_train, y_train)
 
     # Evaluate
     if len(df_daily) >= 10:
         y_pred = model_pipeline.predict(X_test)
         mae = float(mean_absolute_error(y_test, y_pred))
     else:
-        mae = 0.0
+        mae = None  # Not measured: too few rows for a held-out split
     
-    # 6) Versioning
-    result_versions = await db.execute(select(models.ModelVersion))
-    versions = result_versions.scalars().all()
-    if not versions:
-        new_version_number = 1
-    else:
-        nums = []
-        for v in versions:
-            try:
-                nums.append(int(v.version.replace("v", "")))
-            except Exception:
-                continue
-        new_version_number = max(nums) + 1 if nums else 1
-
+    # 5) Versioning (sequence, so concurrent workers never collide on 'version')
+    new_version_number = await db.scalar(select(models.model_version_seq.next_value()))
     version_str = f"v{new_version_number}"
 
-    # 7) Save Model
-    model_path = MODELS_DIR / f"model_{version_str}.pkl"
-    joblib.dump(model_pipeline, model_path)
+    # 6) Save Model
+    await events.publish(events.TRAINING_PROGRESS, {"stage": "saving", "version": version_str, "mae": mae})
+    model_path, digest, is_new = store_artifact(model_pipeline)
 
     # --- MLflow Logging ---
-    mlflow.set_experiment("Shawarma_Sales_Forecast")
-    with mlflow.start_run(run_name=version_str):
+    mlflow.set_experiment(MLFLOW_EXPERIMENT)
+    with mlflow.start_run(run_name=version_str) as run:
         # Log Parameters
         mlflow.log_param("n_estimators", 100)
         mlflow.log_param("random_state", 42)
         mlflow.log_param("version", version_str)
+        mlflow.log_param("artifact_sha256", digest)
         
         # Log Metrics
-        mlflow.log_metric("mae", mae)
+        if mae is not None:
+            mlflow.log_metric("mae", mae)
         
-        # Log Model
-        mlflow.sklearn.log_model(model_pipeline, "model")
+        # Log Model (only the first time this exact model is seen)
+        if is_new:
+            mlflow.sklearn.log_model(model_pipeline, "model")
     # ----------------------
 
-    # 8) Update DB
-    for v in versions:
-        v.is_active = False
-
+    # 7) Update DB: insert, then activate it and deactivate the rest in one UPDATE
     new_model_version = models.ModelVersion(
         version=version_str,
         path=str(model_path),
         mae=mae,
         trained_at=datetime.utcnow(),
-        is_active=True,
+        mlflow_run_id=run.info.run_id,
+        is_active=False,
+        data_revision=revision,
     )
     db.add(new_model_version)
+    await db.flush()
+
+    await db.execute(
+        update(models.ModelVersion)
+        .values(is_active=(models.ModelVersion.id == new_model_version.id))
+        .execution_options(synchronize_session=False)
+    )
     await db.commit()
-    
-    return {
+
+    trained = {
         "version": version_str,
         "mae": mae,
         "path": str(model_path),
         "trained_at": new_model_version.trained_at.isoformat() + "Z",
-    }
\ No newline at end of file
+    }
+
+    # 8) Backtest the new version in the background (stored next to it, by data revision)
+    from .backtest import schedule_backtest
+    schedule_backtest(df_daily, revision, version_str)
+
+    # 9) Push the new model and its forecast to SSE clients, so they don't re-fetch
+    await events.publish(events.MODEL_ACTIVATED, trained)
+    await _publish_forecast(db)
+
+    # 10) Apply the retention policy right away (we already hold the training lock),
+    # so disk and registry stay bounded however often data is written
+    from .retention import compact_registry_locked
+    try:
+        await compact_registry_locked(db)
+    except Exception as e:
+        print(f"Registry compaction failed: {e}")
+
+    return trained
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Boolean, Float, DateTime
+from sqlalchemy import Column, Integer, String, Date, Boolean, Float, DateTime, Sequence
 from datetime import datetime
 from .database import Base
 
@@ -14,6 +14,10 @@ class Sale(Base):
     quantity = Column(Integer)               # Bu kayıtta satılan adet
 
 
+# Source of version numbers ('v' + nextval) so concurrent workers never pick the same one
+model_version_seq = Sequence("model_version_seq", metadata=Base.metadata)
+
+
 class ModelVersion(Base):
     __tablename__ = "model_versions"
 
@@ -23,5 +27,7 @@ class ModelVersion(Base):
     size = Column(String, index=True)                     # Small / Medium / Big
     path = Column(String)                                 # models/model_...pkl
     mae = Column(Float)                                   # Mean Absolute Error
-    trained_at = Column(DateTime, default=datetime.utcnow)
-    is_active = Column(Boolean, default=False)            # Şu an aktif model mi?
\ No newline at end of file
+    trained_at = Column(DateTime, default=datetime.utcnow, index=True)
+    is_active = Column(Boolean, default=False)            # Şu an aktif model mi?
+    mlflow_run_id = Column(String)                        # MLflow run holding its params/metrics/model copy
+    data_revision = Column(String)                        # Hash of the daily aggregate it was trained on
\ No newline at end of file
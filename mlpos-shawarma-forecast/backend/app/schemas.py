@@ -12,7 +12,7 @@ class SaleBase(BaseModel):
     quantity: int
 
 
-from typing import Optional
+from typing import List, Optional
 
 class SaleCreate(SaleBase):
     pass
@@ -26,6 +26,27 @@ class SaleUpdate(BaseModel):
     quantity: Optional[int] = None
 
 
+class SaleFilter(BaseModel):
+    start: Optional[date] = None        # inclusive
+    end: Optional[date] = None          # inclusive
+    product_name: Optional[str] = None
+    size: Optional[str] = None
+
+
+class SaleBatchSelector(BaseModel):
+    # ids and filter are combined with AND; at least one of them is required
+    ids: Optional[List[int]] = None
+    filter: Optional[SaleFilter] = None
+
+
+class SaleBatchDelete(SaleBatchSelector):
+    pass
+
+
+class SaleBatchUpdate(SaleBatchSelector):
+    changes: SaleUpdate
+
+
 class SaleRead(SaleBase):
     id: int
 
@@ -38,7 +59,7 @@ class SaleRead(SaleBase):
 class ModelVersionBase(BaseModel):
     version: str
     path: str
-    mae: float
+    mae: Optional[float] = None  # None when there were too few rows to measure it
 
 
 class ModelVersionCreate(ModelVersionBase):
@@ -22,6 +22,7 @@ async def hard_reset():
             # Use CASCADE to handle foreign keys if any, and RESTART IDENTITY to reset IDs
             await session.execute(text("TRUNCATE TABLE sales RESTART IDENTITY CASCADE"))
             await session.execute(text("TRUNCATE TABLE model_versions RESTART IDENTITY CASCADE"))
+            await session.execute(text("ALTER SEQUENCE IF EXISTS model_version_seq RESTART"))
             await session.commit()
             print("   > Database cleared.")
         except Exception as e:
@@ -30,9 +31,9 @@ async def hard_reset():
             await session.close()
 
     # 2. Delete Model Files
-    print("2. Deleting Model Artifacts (.pkl)...")
+    print("2. Deleting Model Artifacts (.pkl) and Backtest Reports...")
     model_dir = backend_dir / "ml" / "models"
-    files = glob.glob(str(model_dir / "*.pkl"))
+    files = glob.glob(str(model_dir / "*.pkl")) + glob.glob(str(model_dir / "backtest_*.json"))
     for f in files:
         try:
             os.remove(f)
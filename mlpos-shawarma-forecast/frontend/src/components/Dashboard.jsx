@@ -1,21 +1,15 @@
 import React, { useEffect, useState } from 'react';
-import axios from 'axios';
+import { subscribe } from '../events';
 
-const Dashboard = ({ refreshTrigger }) => {
+const Dashboard = () => {
     const [forecast, setForecast] = useState(0);
 
     useEffect(() => {
-        fetchForecast();
-    }, [refreshTrigger]);
-
-    const fetchForecast = async () => {
-        try {
-            const response = await axios.get('http://localhost:8000/forecast/tomorrow');
-            setForecast(response.data.total_predicted_quantity || 0);
-        } catch (error) {
-            console.error("Error fetching forecast:", error);
-        }
-    };
+        // Pushed on connect and whenever a new model goes live
+        return subscribe('forecast_updated', (data) => {
+            setForecast(data.total_predicted_quantity || 0);
+        });
+    }, []);
 
     return (
         <div style={{ border: '1px solid black', padding: '10px', width: '200px' }}>
@@ -1,30 +1,22 @@
 import React, { useEffect, useState } from 'react';
-import axios from 'axios';
+import { subscribe } from '../events';
 
-const Forecast = ({ refreshTrigger }) => {
+const Forecast = () => {
     const [forecast, setForecast] = useState(null);
     const [error, setError] = useState(null);
 
     useEffect(() => {
-        fetchForecast();
-    }, [refreshTrigger]);
-
-    const fetchForecast = async () => {
-        try {
-            const response = await axios.get('http://localhost:8000/forecast/tomorrow');
-            if (response.data.error) {
-                setError(response.data.error);
+        // Pushed on connect and whenever a new model goes live
+        return subscribe('forecast_updated', (data) => {
+            if (data.error) {
+                setError(data.error);
                 setForecast(null);
             } else {
-                setForecast(response.data);
+                setForecast(data);
                 setError(null);
             }
-        } catch (err) {
-            console.error("Forecast error:", err);
-            setError("Model not trained or server error.");
-            setForecast(null);
-        }
-    };
+        });
+    }, []);
 
     return (
         <div style={{ border: '1px solid black', padding: '10px', maxWidth: '600px' }}>
@@ -35,7 +27,10 @@ const Forecast = ({ refreshTrigger }) => {
             ) : forecast ? (
                 <div>
                     <h4>{forecast.date ? `Forecast for ${forecast.date}` : "Tomorrow's Forecast"}</h4>
-                    <p><strong>Total Predicted:</strong> {forecast.total_predicted_quantity}</p>
+                    <p>
+                        <strong>Total Predicted:</strong> {forecast.total_predicted_quantity}
+                        {forecast.total_interval && ` (P10 ${forecast.total_interval.p10} - P90 ${forecast.total_interval.p90})`}
+                    </p>
 
                     <table border="1" cellPadding="5" style={{ width: '100%', borderCollapse: 'collapse' }}>
                         <thead>
@@ -43,6 +38,7 @@ const Forecast = ({ refreshTrigger }) => {
                                 <th>Product</th>
                                 <th>Size</th>
                                 <th>Qty</th>
+                                <th>P10 - P90</th>
                             </tr>
                         </thead>
                         <tbody>
@@ -51,6 +47,7 @@ const Forecast = ({ refreshTrigger }) => {
                                     <td>{item.product_name}</td>
                                     <td>{item.size}</td>
                                     <td style={{ textAlign: 'right' }}>{item.predicted_quantity}</td>
+                                    <td style={{ textAlign: 'right' }}>{item.p10} - {item.p90}</td>
                                 </tr>
                             ))}
                         </tbody>
@@ -1,11 +1,18 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import axios from 'axios';
+import { subscribe } from '../events';
 
-const SalesUpload = ({ onUploadSuccess }) => {
+const SalesUpload = () => {
     const [file, setFile] = useState(null);
     const [uploading, setUploading] = useState(false);
     const [message, setMessage] = useState('');
 
+    useEffect(() => {
+        return subscribe('training_progress', (data) => {
+            if (uploading) setMessage(`Training: ${data.stage}...`);
+        });
+    }, [uploading]);
+
     const handleFileChange = (e) => {
         if (e.target.files) {
             setFile(e.target.files[0]);
@@ -28,7 +35,7 @@ const SalesUpload = ({ onUploadSuccess }) => {
             setMessage(`Success: ${response.data.message} `);
             setFile(null);
             // Reset file input manually if needed, or just let it be
-            if (onUploadSuccess) onUploadSuccess();
+            // Dashboard / Forecast update themselves from the forecast_updated event
         } catch (error) {
             console.error("Upload failed:", error);
             const errorMsg = error.response?.data?.detail || "Upload failed";
@@ -0,0 +1,21 @@
+// One shared EventSource for the whole app (browsers limit open connections per host)
+let source = null;
+let listenerCount = 0;
+
+export const subscribe = (eventName, handler) => {
+    if (!source) {
+        source = new EventSource('http://localhost:8000/events');
+    }
+    const listener = (e) => handler(JSON.parse(e.data));
+    source.addEventListener(eventName, listener);
+    listenerCount += 1;
+
+    return () => {
+        source.removeEventListener(eventName, listener);
+        listenerCount -= 1;
+        if (listenerCount === 0) {
+            source.close();
+            source = null;
+        }
+    };
+};